@@ -18,33 +18,40 @@ import os
 import sys
 import subprocess
 import json
+import re
+import shutil
 import logging
-import argparse
-import winreg
+import functools
+import time
 from pathlib import Path
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, List, Dict, Callable, FrozenSet, NamedTuple
 import ctypes
-from ctypes import wintypes
-import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
 import threading
+import queue
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
-# First, check for tkinter
-try:
-    import tkinter
-except ImportError:
-    print("FATAL ERROR: Python is missing the Tkinter library, which is required for the GUI.")
-    print("This is uncommon, but can happen with custom Python installations.")
-    print("\nPlease reinstall Python from https://python.org, ensuring the 'tcl/tk and IDLE' feature is selected.")
-    sys.exit(1)
+# GUI modules are imported lazily (see load_tkinter) so console runs skip
+# loading Tk; an explicit --gui request still checks for it up front
+if __name__ == "__main__" and '--gui' in sys.argv:
+    try:
+        import tkinter
+    except ImportError:
+        print("FATAL ERROR: Python is missing the Tkinter library, which is required for the GUI.")
+        print("This is uncommon, but can happen with custom Python installations.")
+        print("\nPlease reinstall Python from https://python.org, ensuring the 'tcl/tk and IDLE' feature is selected.")
+        sys.exit(1)
 
-# Configure logging
+# Configure logging; the console stays at INFO so --verbose's per-line
+# command output only goes to the log file
+console_handler = logging.StreamHandler(sys.stdout)
+console_handler.setLevel(logging.INFO)
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
         logging.FileHandler('claude_installer.log'),
-        logging.StreamHandler(sys.stdout)
+        console_handler
     ]
 )
 logger = logging.getLogger(__name__)
@@ -61,30 +68,165 @@ class Colors:
     RESET = '\033[0m'
     BOLD = '\033[1m'
 
-def colored_print(message: str, color: str = Colors.WHITE) -> None:
+# Color only when writing to a terminal and NO_COLOR isn't set; decided once
+# here so the print helpers below carry no per-call check
+USE_COLOR = sys.stdout is not None and sys.stdout.isatty() and 'NO_COLOR' not in os.environ
+
+def _colorize_ansi(message: str, color: str = Colors.WHITE) -> str:
+    """Wrap message in ANSI color codes"""
+    return f"{color}{message}{Colors.RESET}"
+
+def _colorize_plain(message: str, color: str = Colors.WHITE) -> str:
+    """Return message unchanged (color disabled)"""
+    return message
+
+def _cprint_ansi(message: str, color: str = Colors.WHITE) -> None:
     """Print colored message to console"""
-    print(f"{color}{message}{Colors.RESET}")
+    print(_colorize_ansi(message, color))
+
+def _cprint_plain(message: str, color: str = Colors.WHITE) -> None:
+    """Print message to console without color codes"""
+    print(message)
 
+colorize = _colorize_ansi if USE_COLOR else _colorize_plain
+colored_print = _cprint_ansi if USE_COLOR else _cprint_plain
+
+def colored_block(*lines: Tuple[str, str]) -> str:
+    """Join (message, color) pairs into one pre-colored multi-line string"""
+    return "".join(colorize(message, color) + "\n" for message, color in lines)
+
+def print_block(block: str) -> None:
+    """Write a pre-built block to the console in a single write"""
+    sys.stdout.write(block)
+    sys.stdout.flush()
+
+def load_tkinter() -> None:
+    """Import the Tk modules used by the GUI into this module's namespace"""
+    global tk, ttk, messagebox, scrolledtext
+    import tkinter as tk
+    from tkinter import ttk, messagebox, scrolledtext
+
+@functools.lru_cache(maxsize=1)
 def is_admin() -> bool:
-    """Check if running with administrator privileges"""
+    """Check if running with administrator privileges (fixed for the process lifetime)"""
     try:
-        return ctypes.windll.shell32.IsUserAnAdmin()
-    except:
+        return bool(ctypes.windll.shell32.IsUserAnAdmin())
+    except (AttributeError, OSError):  # no windll off Windows
         return False
 
-def run_command(command: List[str], check: bool = True, capture: bool = True) -> subprocess.CompletedProcess:
-    """Run a command with proper error handling"""
+# wsl.exe resolved once at import so no call pays for a PATH search; the
+# System32 fallback also covers WSL being installed while we run
+WSL_EXE = shutil.which('wsl') or os.path.join(os.environ.get('SystemRoot', r'C:\Windows'),
+                                              'System32', 'wsl.exe')
+
+# wsl.exe writes its own messages and listings as UTF-16LE (not what runs inside a distro)
+WSL_ENCODING = 'utf-16-le'
+
+def decode_wsl_output(raw: bytes) -> str:
+    """Decode wsl.exe's own output, telling UTF-16LE from UTF-8 by its BOM or NUL bytes"""
+    # WSL_UTF8=1 switches wsl.exe to UTF-8; UTF-8 text never contains NULs,
+    # while UTF-16LE text of ASCII names is full of them
+    if raw.startswith(b'\xff\xfe') or b'\x00' in raw:
+        return raw.decode('utf-16-le', errors='replace').lstrip('\ufeff')
+    return raw.decode('utf-8', errors='replace')
+
+# Environment for host wsl.exe calls: WSL_UTF8=1 would switch its output to
+# UTF-8, so it is dropped to keep WSL_ENCODING true whatever the user has set
+WSL_HOST_ENV = {name: value for name, value in os.environ.items() if name.upper() != 'WSL_UTF8'}
+
+# On Windows, don't let console children (wsl.exe etc.) spawn a conhost window;
+# all their I/O goes through pipes anyway
+POPEN_FLAGS = {'creationflags': getattr(subprocess, 'CREATE_NO_WINDOW', 0x08000000)} \
+    if sys.platform == 'win32' else {}
+
+# Optional callback that receives every line of subprocess output as it arrives
+_output_handler: Optional[Callable[[str], None]] = None
+
+def set_output_handler(handler: Optional[Callable[[str], None]]) -> None:
+    """Route live subprocess output to handler (None to disable)"""
+    global _output_handler
+    _output_handler = handler
+
+def _pump_stream(stream, name: str, lines: queue.Queue) -> None:
+    """Forward lines from a child's pipe (text or binary) into a queue until EOF"""
+    # read(0) is '' or b'', the EOF marker matching the pipe's mode
+    for line in iter(stream.readline, stream.read(0)):
+        lines.put((name, line))
+    stream.close()
+
+def run_command(command: List[str], check: bool = True, capture: bool = True,
+                on_output: Optional[Callable[[str], None]] = None,
+                encoding: Optional[str] = 'utf-8', timeout: Optional[int] = 300,
+                env: Optional[Dict[str, str]] = None) -> subprocess.CompletedProcess:
+    """Run a command with proper error handling, streaming its output as it arrives
+    
+    Output is always logged line by line; stdout is only kept in memory when
+    capture is set (stderr is kept regardless, for error reporting). timeout
+    is in seconds; None waits indefinitely. env replaces the inherited
+    environment when given.
+    
+    With encoding=None the output is returned as undecoded bytes, for
+    callers that must inspect it before choosing an encoding; it is then
+    neither logged nor passed to on_output line by line.
+    """
+    on_output = on_output or _output_handler
     try:
         logger.info(f"Running command: {' '.join(command)}")
-        result = subprocess.run(
-            command,
-            check=check,
-            capture_output=capture,
-            text=True,
-            timeout=300  # 5 minute timeout
+        text_mode = {'encoding': encoding, 'errors': 'replace'} if encoding else {}
+        proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                env=env, **text_mode, **POPEN_FLAGS)
+        
+        # Read each pipe on its own thread so neither can fill up and stall
+        # the child while this thread polls for completion
+        lines = queue.Queue()
+        readers = [threading.Thread(target=_pump_stream, args=(stream, name, lines), daemon=True)
+                   for name, stream in (('stdout', proc.stdout), ('stderr', proc.stderr))]
+        for reader in readers:
+            reader.start()
+        
+        captured = {'stdout': [], 'stderr': []}
+        join = ('\n' if encoding else b'').join
+        
+        def drain():
+            while True:
+                try:
+                    name, line = lines.get_nowait()
+                except queue.Empty:
+                    return
+                if not encoding:
+                    # Raw lines keep their terminators so join() restores the bytes exactly
+                    if capture or name == 'stderr':
+                        captured[name].append(line)
+                    continue
+                line = line.rstrip('\n')
+                logger.debug(line)
+                if capture or name == 'stderr':
+                    captured[name].append(line)
+                if on_output:
+                    on_output(line)
+        
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while proc.poll() is None:
+            drain()
+            if deadline is not None and time.monotonic() > deadline:
+                proc.kill()
+                proc.wait()
+                raise subprocess.TimeoutExpired(command, timeout,
+                                                output=join(captured['stdout']),
+                                                stderr=join(captured['stderr']))
+            time.sleep(0.05)
+        
+        for reader in readers:
+            reader.join()
+        drain()
+        
+        result = subprocess.CompletedProcess(
+            command, proc.returncode,
+            stdout=join(captured['stdout']) if capture else None,
+            stderr=join(captured['stderr'])
         )
-        if result.stdout:
-            logger.debug(f"Command output: {result.stdout}")
+        if check:
+            result.check_returncode()
         return result
     except subprocess.CalledProcessError as e:
         logger.error(f"Command failed: {e}")
@@ -95,36 +237,276 @@ def run_command(command: List[str], check: bool = True, capture: bool = True) ->
         logger.error(f"Command timed out: {e}")
         raise
 
+class WSLSession:
+    """Persistent bash shell inside a WSL distribution
+    
+    Launching wsl.exe costs far more than the commands run through it, so
+    commands are written to one long-lived shell and each is terminated by a
+    sentinel line carrying its exit status.
+    """
+    
+    def __init__(self, distro: str = 'Ubuntu', user: Optional[str] = None):
+        self.distro = distro
+        self.user = user  # None runs as the distro's default user
+        self._proc: Optional[subprocess.Popen] = None
+        self._lines: Optional[queue.Queue] = None
+        self._lock = threading.Lock()
+        self._sentinel = f"__END_{uuid.uuid4().hex}__"
+    
+    def _start(self) -> None:
+        """Start the shell and a thread that forwards its output lines"""
+        logger.info(f"Starting WSL session for {self.distro}")
+        command = [WSL_EXE, '-d', self.distro]
+        if self.user:
+            command += ['-u', self.user]
+        # Binary pipes: text mode would turn "\n" into "\r\n" on Windows
+        self._proc = subprocess.Popen(command + ['--', 'bash', '-l'],
+                                      stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      stderr=subprocess.STDOUT, **POPEN_FLAGS)
+        self._lines = queue.Queue()
+        
+        def pump(stream, lines):
+            for raw in iter(stream.readline, b''):
+                lines.put(raw.decode('utf-8', errors='replace').rstrip('\r\n'))
+            lines.put(None)  # EOF: the shell exited
+        
+        threading.Thread(target=pump, args=(self._proc.stdout, self._lines), daemon=True).start()
+    
+    def run(self, cmd: str, check: bool = False, timeout: Optional[float] = 300,
+            on_output: Optional[Callable[[str], None]] = None) -> Tuple[str, int]:
+        """Run cmd in the session and return its combined output and exit status"""
+        on_output = on_output or _output_handler
+        with self._lock:
+            if self._proc is None or self._proc.poll() is not None:
+                self._start()
+            
+            logger.info(f"Running in WSL session: {cmd}")
+            # The subshell keeps `set -e`/`exit` in cmd from killing the session,
+            # and /dev/null stops cmd from consuming the session's own stdin
+            script = f"(\n{cmd}\n) < /dev/null\nprintf '\\n{self._sentinel}%d\\n' $?\n"
+            self._proc.stdin.write(script.encode('utf-8'))
+            self._proc.stdin.flush()
+            
+            deadline = None if timeout is None else time.monotonic() + timeout
+            output = []
+            while True:
+                try:
+                    if deadline is None:
+                        line = self._lines.get()
+                    else:
+                        line = self._lines.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    self.close()
+                    logger.error(f"WSL session command timed out: {cmd}")
+                    raise subprocess.TimeoutExpired(cmd, timeout, output='\n'.join(output))
+                
+                if line is None:
+                    self._proc = None
+                    raise RuntimeError(f"WSL session for {self.distro} exited unexpectedly")
+                if line.startswith(self._sentinel):
+                    returncode = int(line[len(self._sentinel):])
+                    break
+                output.append(line)
+                if on_output and line:
+                    on_output(line)
+        
+        # printf's leading newline terminates any unfinished last line of
+        # output, which leaves one empty line behind when output ended cleanly
+        if output and output[-1] == '':
+            output.pop()
+        stdout = '\n'.join(output)
+        if stdout:
+            logger.debug(f"Command output: {stdout}")
+        if check and returncode != 0:
+            logger.error(f"Command failed with exit status {returncode}: {cmd}")
+            raise subprocess.CalledProcessError(returncode, cmd, output=stdout)
+        return stdout, returncode
+    
+    def close(self) -> None:
+        """Terminate the session's shell"""
+        if self._proc is not None:
+            try:
+                self._proc.stdin.close()
+            except OSError:
+                pass
+            self._proc.kill()
+            self._proc = None
+
+# Subprocess timeouts in seconds: detection should fail fast when WSL hangs,
+# while apt/npm installs on a slow connection can legitimately take a while
+PROBE_TIMEOUT = 10
+SESSION_PROBE_TIMEOUT = 30  # the first session command also boots the distro
+INSTALL_TIMEOUT = 1800
+
+# How long a detection result stays valid before the probe is re-run
+PROBE_CACHE_TTL = 30  # seconds
+
+def cached_probe(method):
+    """Cache a manager's detection result for PROBE_CACHE_TTL seconds"""
+    # Probes run concurrently (run_probes, and is_claude_installed asking for
+    # Ubuntu); a caller arriving mid-probe waits for that result instead of
+    # starting the same subprocess again
+    lock = threading.Lock()
+    
+    @functools.wraps(method)
+    def wrapper(self) -> bool:
+        with lock:
+            now = time.monotonic()
+            cached = self._cache.get(method.__name__)
+            if cached is not None and now - cached[0] < PROBE_CACHE_TTL:
+                return cached[1]
+            result = method(self)
+            self._cache[method.__name__] = (now, result)
+            return result
+    return wrapper
+
+# Installer state persisted between runs (e.g. a verified Claude Code install)
+STATE_FILE = Path(os.environ.get('LOCALAPPDATA', str(Path.home()))) / 'ClaudeCodeInstaller' / 'state.json'
+
+# How long a recorded Claude Code install is trusted before probing WSL again
+MARKER_MAX_AGE = 24 * 60 * 60  # seconds
+
+def load_state() -> dict:
+    """Read the persisted installer state (empty if missing or unreadable)"""
+    try:
+        with open(STATE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_state(state: dict) -> None:
+    """Persist installer state; failures are logged, never fatal"""
+    try:
+        STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(STATE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+    except OSError as e:
+        logger.warning(f"Could not save installer state: {e}")
+
+def run_probes(probes: Dict[str, Callable[[], bool]]) -> Dict[str, bool]:
+    """Run independent detection probes concurrently and collect their results"""
+    if not probes:
+        return {}
+    # Each probe is dominated by a WSL subprocess, so running them in
+    # parallel makes the total wait the slowest probe instead of the sum
+    with ThreadPoolExecutor(max_workers=len(probes)) as executor:
+        futures = {name: executor.submit(probe) for name, probe in probes.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+# Bash script that prepares Ubuntu for Claude Code; the trailing node=/npm=
+# lines are parsed by setup_ubuntu_environment. It runs as root: the session
+# has no terminal, so sudo could not prompt for the user's password
+UBUNTU_SETUP_SCRIPT = """\
+set -eo pipefail
+# Package lists refreshed in the last 6 hours are fresh enough to skip the
+# update. apt keeps the server's timestamps on the lists themselves, so the
+# time of our last successful update is kept in a stamp file of our own
+stamp=/var/lib/apt/claude-installer-update-stamp
+if [ -z "$(find "$stamp" -mmin -360 2>/dev/null)" ]; then
+    echo "Updating package lists..."
+    apt update -y
+    touch "$stamp"
+else
+    echo "Package lists are up to date, skipping apt update"
+fi
+# A full `apt upgrade` takes minutes on a fresh image and Node.js doesn't
+# need it; only refresh the CA bundle so the NodeSource download verifies
+apt install --only-upgrade -y ca-certificates
+echo "Installing essential packages..."
+apt install -y curl wget git build-essential
+echo "Installing Node.js and npm..."
+curl -fsSL https://deb.nodesource.com/setup_18.x | bash -
+apt install -y nodejs
+node_version=$(node --version)
+npm_version=$(npm --version)
+echo "node=$node_version"
+echo "npm=$npm_version"
+"""
+
+# Created under HKCU once WSL has been set up for the user; lists its distributions
+LXSS_KEY = r"Software\Microsoft\Windows\CurrentVersion\Lxss"
+
 class WSLManager:
     """Handles WSL installation and management"""
     
+    def __init__(self, session: Optional[WSLSession] = None):
+        self.session = session or WSLSession()
+        self._cache: Dict[str, Tuple[float, bool]] = {}
+        self._wsl_list: Optional[subprocess.CompletedProcess] = None
+        self._wsl_list_lock = threading.Lock()  # concurrent probes share one listing
+        self._distros: Optional[FrozenSet[str]] = None
+    
+    def invalidate(self) -> None:
+        """Forget cached detection results"""
+        self._cache.clear()
+        self._wsl_list = None
+        self._distros = None
+    
+    def wsl_list(self) -> subprocess.CompletedProcess:
+        """Return the `wsl --list --quiet` result, running it at most once until invalidate()"""
+        with self._wsl_list_lock:
+            result = self._wsl_list
+            if result is None:
+                # --quiet prints bare names; the raw bytes are sniffed rather than
+                # trusting WSL_ENCODING, since the names decide what gets installed
+                result = run_command([WSL_EXE, '--list', '--quiet'], check=False,
+                                     encoding=None, env=WSL_HOST_ENV, timeout=PROBE_TIMEOUT)
+                result.stdout = decode_wsl_output(result.stdout)
+                result.stderr = decode_wsl_output(result.stderr)
+                self._wsl_list = result
+            return result
+    
+    def distros(self) -> FrozenSet[str]:
+        """Lower-cased names of installed distributions, parsed once per listing"""
+        if self._distros is None:
+            result = self.wsl_list()
+            names = set()
+            if result.returncode == 0:
+                for line in result.stdout.splitlines():
+                    name = line.strip().lstrip('\ufeff').lower()
+                    if name:
+                        names.add(name)
+            self._distros = frozenset(names)
+        return self._distros
+    
+    def has_wsl_registration(self) -> bool:
+        """Check the per-user Lxss registry key that WSL creates once it is set up"""
+        import winreg
+        try:
+            with winreg.OpenKey(winreg.HKEY_CURRENT_USER, LXSS_KEY):
+                return True
+        except WindowsError:
+            return False
+    
+    @cached_probe
     def is_wsl_installed(self) -> bool:
         """Check if WSL is installed"""
+        # A file check is much cheaper than failing to spawn a missing wsl.exe
+        if not os.path.exists(WSL_EXE):
+            return False
+        # A registered WSL answers in-process; without the key WSL may still be
+        # installed but unused, so only then ask wsl.exe itself
+        if self.has_wsl_registration():
+            return True
         try:
-            result = run_command(['wsl', '--version'], check=False)
+            # Older Windows builds ship a wsl.exe stub that fails on --version
+            result = run_command([WSL_EXE, '--version'], check=False, capture=False,
+                                 encoding=WSL_ENCODING, env=WSL_HOST_ENV, timeout=PROBE_TIMEOUT)
             return result.returncode == 0
         except FileNotFoundError:
             return False
+        except subprocess.TimeoutExpired:
+            return False
     
+    @cached_probe
     def is_ubuntu_installed(self) -> bool:
         """Check if Ubuntu is installed in WSL"""
         try:
-            # Use the same command format that works: wsl -l -v
-            result = run_command(['wsl', '-l', '-v'], check=False)
-            logger.info(f"WSL list command returned: {result.returncode}")
-            logger.info(f"WSL list output (raw): {repr(result.stdout)}")
+            distros = self.distros()
+            logger.info(f"WSL distributions: {sorted(distros)}")
             
-            if result.returncode == 0:
-                # WSL sometimes returns UTF-16 output with null bytes, clean it up
-                clean_output = result.stdout.replace('\x00', '').strip()
-                logger.info(f"WSL list output (cleaned): '{clean_output}'")
-                
-                # Check if Ubuntu appears in the cleaned output (case-insensitive)
-                output_lower = clean_output.lower()
-                has_ubuntu = 'ubuntu' in output_lower
-                logger.info(f"Checking for 'ubuntu' in cleaned output: {has_ubuntu}")
-                return has_ubuntu
-            return False
+            # Exact match: the rest of the installer targets the distro named "Ubuntu"
+            return 'ubuntu' in distros
         except FileNotFoundError:
             logger.error("WSL command not found")
             return False
@@ -136,79 +518,108 @@ class WSLManager:
         """Install WSL"""
         try:
             colored_print("Installing WSL...", Colors.YELLOW)
-            run_command(['wsl', '--install', '--no-launch'])
+            run_command([WSL_EXE, '--install', '--no-launch'], capture=False,
+                        encoding=WSL_ENCODING, env=WSL_HOST_ENV, timeout=None)
             colored_print("WSL installed successfully!", Colors.GREEN)
             return True
         except Exception as e:
             colored_print(f"Failed to install WSL: {e}", Colors.RED)
             return False
+        finally:
+            self.invalidate()
     
     def install_ubuntu(self) -> bool:
         """Install Ubuntu distribution"""
         try:
             colored_print("Installing Ubuntu distribution...", Colors.YELLOW)
-            run_command(['wsl', '--install', '-d', 'Ubuntu', '--no-launch'])
+            run_command([WSL_EXE, '--install', '-d', 'Ubuntu', '--no-launch'], capture=False,
+                        encoding=WSL_ENCODING, env=WSL_HOST_ENV, timeout=None)
+            # A fresh distro has no Claude Code, whatever an earlier install recorded
+            state = load_state()
+            state.pop('claude_installed_at', None)
+            save_state(state)
             colored_print("Ubuntu installed successfully!", Colors.GREEN)
             return True
         except Exception as e:
             colored_print(f"Failed to install Ubuntu: {e}", Colors.RED)
             return False
+        finally:
+            self.invalidate()
     
     def setup_ubuntu_environment(self) -> bool:
         """Setup Ubuntu environment with Node.js and dependencies"""
         try:
             colored_print("Setting up Ubuntu environment...", Colors.YELLOW)
             
-            # Update package lists
-            colored_print("Updating package lists...", Colors.CYAN)
-            run_command(['wsl', '-d', 'Ubuntu', '--', 'sudo', 'apt', 'update', '-y'])
-            run_command(['wsl', '-d', 'Ubuntu', '--', 'sudo', 'apt', 'upgrade', '-y'])
-            
-            # Install essential packages
-            colored_print("Installing essential packages...", Colors.CYAN)
-            run_command(['wsl', '-d', 'Ubuntu', '--', 'sudo', 'apt', 'install', '-y', 
-                        'curl', 'wget', 'git', 'build-essential'])
-            
-            # Install Node.js and npm
-            colored_print("Installing Node.js and npm...", Colors.CYAN)
-            run_command(['wsl', '-d', 'Ubuntu', '--', 'curl', '-fsSL', 
-                        'https://deb.nodesource.com/setup_18.x', '|', 'sudo', '-E', 'bash', '-'])
-            run_command(['wsl', '-d', 'Ubuntu', '--', 'sudo', 'apt', 'install', '-y', 'nodejs'])
+            # Run the whole pipeline as one script in a single root shell;
+            # every separate `wsl` launch pays the distro start-up cost again
+            root_session = WSLSession(self.session.distro, user='root')
+            try:
+                output, _ = root_session.run(UBUNTU_SETUP_SCRIPT, check=True, timeout=INSTALL_TIMEOUT)
+            finally:
+                root_session.close()
             
             # Verify installation
-            node_result = run_command(['wsl', '-d', 'Ubuntu', '--', 'node', '--version'])
-            npm_result = run_command(['wsl', '-d', 'Ubuntu', '--', 'npm', '--version'])
-            
-            colored_print(f"Node.js version: {node_result.stdout.strip()}", Colors.GREEN)
-            colored_print(f"npm version: {npm_result.stdout.strip()}", Colors.GREEN)
+            versions = dict(line.split('=', 1) for line in output.splitlines()
+                            if line.startswith(('node=', 'npm=')))
+            colored_print(f"Node.js version: {versions.get('node', 'unknown')}", Colors.GREEN)
+            colored_print(f"npm version: {versions.get('npm', 'unknown')}", Colors.GREEN)
             
             return True
         except Exception as e:
             colored_print(f"Failed to setup Ubuntu environment: {e}", Colors.RED)
             return False
+        finally:
+            self.invalidate()
 
 class ClaudeCodeManager:
     """Handles Claude Code installation"""
     
+    def __init__(self, session: Optional[WSLSession] = None,
+                 wsl_manager: Optional[WSLManager] = None):
+        self.session = session or WSLSession()
+        self.wsl_manager = wsl_manager or WSLManager(self.session)
+        self._cache: Dict[str, Tuple[float, bool]] = {}
+    
+    def invalidate(self) -> None:
+        """Forget cached detection results"""
+        self._cache.clear()
+    
+    def record_installed(self, installed: bool) -> None:
+        """Update the on-disk marker that lets later runs skip the WSL probe"""
+        state = load_state()
+        state['version'] = __version__
+        if installed:
+            state['claude_installed_at'] = time.time()
+        else:
+            state.pop('claude_installed_at', None)
+        save_state(state)
+    
+    @cached_probe
     def is_claude_installed(self) -> bool:
         """Check if Claude Code is installed"""
+        # A recent verified install recorded on disk saves booting the distro.
+        # The marker outlives an unregistered distro, so it only counts while
+        # Ubuntu is still listed (a `wsl --list`, which doesn't start it)
+        installed_at = load_state().get('claude_installed_at')
+        if installed_at is not None and time.time() - installed_at < MARKER_MAX_AGE:
+            if not self.wsl_manager.is_ubuntu_installed():
+                logger.info("Claude Code install marker ignored, Ubuntu is not installed")
+                self.record_installed(False)
+                return False
+            logger.info("Claude Code install marker is fresh, skipping WSL probe")
+            return True
+        
         try:
             # Use interactive shell since Claude Code often only works in interactive mode
             # This simulates what happens when you type 'ubuntu' then 'claude'
-            result = run_command(['wsl', '-d', 'Ubuntu', 'bash', '-ic', 'which claude'], check=False)
-            logger.info(f"Interactive 'which claude' returned: {result.returncode}, output: {repr(result.stdout)}")
-            
-            if result.returncode == 0 and result.stdout.strip():
-                return True
-            
-            # Try running claude --version in interactive mode
-            result2 = run_command(['wsl', '-d', 'Ubuntu', 'bash', '-ic', 'claude --version'], check=False)
-            logger.info(f"Interactive 'claude --version' returned: {result2.returncode}, output: {repr(result2.stdout)}")
-            
-            if result2.returncode == 0:
-                return True
-                
-            return False
+            output, returncode = self.session.run(
+                "bash -ic 'command -v claude && claude --version' 2>/dev/null",
+                timeout=SESSION_PROBE_TIMEOUT)
+            logger.info(f"Interactive claude lookup returned: {returncode}, output: {repr(output)}")
+            if returncode == 0:
+                self.record_installed(True)
+            return returncode == 0
         except Exception as e:
             logger.error(f"Error checking Claude Code: {e}")
             return False
@@ -218,37 +629,56 @@ class ClaudeCodeManager:
         try:
             colored_print("Installing Claude Code...", Colors.YELLOW)
             
-            # Set npm config for Linux
-            run_command(['wsl', '-d', 'Ubuntu', '--', 'npm', 'config', 'set', 'os', 'linux'])
-            
-            # Install Claude Code
-            run_command(['wsl', '-d', 'Ubuntu', '--', 'npm', 'install', '-g', 
-                        '@anthropic-ai/claude-code', '--force', '--no-os-check'])
-            
-            # Verify installation
-            version_result = run_command(['wsl', '-d', 'Ubuntu', '--', 'claude', '--version'])
+            # Configure npm, install and verify in one round-trip to the WSL session.
+            # Audit and funding lookups are extra registry round-trips that the
+            # install waits on; the env vars also cover nested lifecycle scripts
+            output, _ = self.session.run('export NPM_CONFIG_FUND=false NPM_CONFIG_AUDIT=false && '
+                                         'npm config set os linux && '
+                                         'npm install -g @anthropic-ai/claude-code --force --no-os-check '
+                                         '--no-audit --no-fund --prefer-offline --loglevel=error && '
+                                         'claude --version', check=True, timeout=INSTALL_TIMEOUT)
+            version = output.splitlines()[-1] if output else ''
             colored_print(f"Claude Code installed successfully!", Colors.GREEN)
-            colored_print(f"Version: {version_result.stdout.strip()}", Colors.GREEN)
+            colored_print(f"Version: {version}", Colors.GREEN)
             
+            self.record_installed(True)
             return True
         except Exception as e:
             colored_print(f"Failed to install Claude Code: {e}", Colors.RED)
+            self.record_installed(False)
             return False
+        finally:
+            self.invalidate()
 
 class ContextMenuManager:
     """Handles Windows context menu integration"""
     
+    # HKCR keys for each menu entry and the placeholder Explorer replaces with the folder path
+    MENU_KEYS = [
+        (r"Directory\Background\shell\OpenInClaude", "%V"),  # right-click in empty space
+        (r"Directory\shell\OpenInClaude", "%1"),  # right-click on a folder
+    ]
+    ICON = r"C:\Windows\System32\cmd.exe,0"
+    
     def __init__(self):
         self.scripts_dir = Path("C:/Scripts")
         self.launcher_path = self.scripts_dir / "open_in_claude.cmd"
+        self._cache: Dict[str, Tuple[float, bool]] = {}
+    
+    def invalidate(self) -> None:
+        """Forget cached detection results"""
+        self._cache.clear()
     
+    @cached_probe
     def is_installed(self) -> bool:
         """Check if context menu is installed"""
+        import winreg
         try:
-            key = winreg.OpenKey(winreg.HKEY_CLASSES_ROOT, 
-                               r"Directory\Background\shell\OpenInClaude")
-            winreg.CloseKey(key)
-            return True
+            with winreg.OpenKey(winreg.HKEY_CLASSES_ROOT, self.MENU_KEYS[0][0]) as key:
+                # Read the command through the same handle so an entry pointing
+                # at some other launcher doesn't count as installed
+                command = winreg.QueryValue(key, "command")
+            return str(self.launcher_path) in command
         except WindowsError:
             return False
     
@@ -275,10 +705,10 @@ echo %date% %time% - Starting Claude Code launcher > "C:\\Scripts\\claude_launch
 echo %date% %time% - Windows path: %WINPATH% >> "C:\\Scripts\\claude_launcher.log"
 
 :: Convert Windows path to WSL format manually
-:: Extract drive letter and convert to lowercase
+:: Extract drive letter and convert to lowercase with a case-insensitive
+:: match, avoiding a slow "call set" re-parse for every letter
 set "DRIVE=%WINPATH:~0,1%"
-for %%i in (A B C D E F G H I J K L M N O P Q R S T U V W X Y Z) do call set "DRIVE=%%DRIVE:%%i=%%i%%"
-for %%i in (a b c d e f g h i j k l m n o p q r s t u v w x y z) do call set "DRIVE=%%DRIVE:%%i=%%i%%"
+for %%i in (a b c d e f g h i j k l m n o p q r s t u v w x y z) do if /i "%DRIVE%"=="%%i" set "DRIVE=%%i"
 
 :: Get the rest of the path (everything after C:)
 set "RESTPATH=%WINPATH:~2%"
@@ -331,6 +761,7 @@ exit /b 0
     
     def install_context_menu(self) -> bool:
         """Install context menu integration"""
+        import winreg
         try:
             colored_print("Installing context menu integration...", Colors.YELLOW)
             
@@ -338,40 +769,35 @@ exit /b 0
             if not self.create_launcher_script():
                 return False
             
-            # Registry entries for folder background (right-click in empty space)
-            bg_key = winreg.CreateKey(winreg.HKEY_CLASSES_ROOT, 
-                                    r"Directory\\Background\\shell\\OpenInClaude")
-            winreg.SetValue(bg_key, "", winreg.REG_SZ, "Open in Claude Code")
-            winreg.SetValueEx(bg_key, "Icon", 0, winreg.REG_SZ, 
-                            "C:\\Windows\\System32\\cmd.exe,0")
-            
-            bg_cmd_key = winreg.CreateKey(bg_key, "command")
-            winreg.SetValue(bg_cmd_key, "", winreg.REG_SZ, 
-                          f'"{self.launcher_path}" "%V"')
-            
-            winreg.CloseKey(bg_cmd_key)
-            winreg.CloseKey(bg_key)
-            
-            # Registry entries for folders themselves (right-click on folder)
-            folder_key = winreg.CreateKey(winreg.HKEY_CLASSES_ROOT, 
-                                        r"Directory\\shell\\OpenInClaude")
-            winreg.SetValue(folder_key, "", winreg.REG_SZ, "Open in Claude Code")
-            winreg.SetValueEx(folder_key, "Icon", 0, winreg.REG_SZ, 
-                            "C:\\Windows\\System32\\cmd.exe,0")
-            
-            folder_cmd_key = winreg.CreateKey(folder_key, "command")
-            winreg.SetValue(folder_cmd_key, "", winreg.REG_SZ, 
-                          f'"{self.launcher_path}" "%1"')
-            
-            winreg.CloseKey(folder_cmd_key)
-            winreg.CloseKey(folder_key)
+            # One handle per entry; SetValue creates the "command" subkey itself
+            for key_path, placeholder in self.MENU_KEYS:
+                with winreg.CreateKey(winreg.HKEY_CLASSES_ROOT, key_path) as key:
+                    winreg.SetValue(key, "", winreg.REG_SZ, "Open in Claude Code")
+                    winreg.SetValueEx(key, "Icon", 0, winreg.REG_SZ, self.ICON)
+                    winreg.SetValue(key, "command", winreg.REG_SZ,
+                                    f'"{self.launcher_path}" "{placeholder}"')
             
             colored_print("Context menu integration installed successfully!", Colors.GREEN)
             return True
             
         except Exception as e:
             colored_print(f"Failed to install context menu: {e}", Colors.RED)
+            # Don't leave a half-written menu entry pointing nowhere
+            self.remove_menu_keys()
             return False
+        finally:
+            self.invalidate()
+    
+    def remove_menu_keys(self) -> None:
+        """Delete all context menu registry keys, skipping ones that don't exist"""
+        import winreg
+        for key_path, _ in self.MENU_KEYS:
+            # Child first: DeleteKey refuses keys that still have subkeys
+            for path in (key_path + r"\command", key_path):
+                try:
+                    winreg.DeleteKey(winreg.HKEY_CLASSES_ROOT, path)
+                except WindowsError:
+                    pass  # Key might not exist
     
     def uninstall_context_menu(self) -> bool:
         """Remove context menu integration"""
@@ -379,21 +805,7 @@ exit /b 0
             colored_print("Removing context menu integration...", Colors.YELLOW)
             
             # Remove registry entries
-            try:
-                winreg.DeleteKey(winreg.HKEY_CLASSES_ROOT, 
-                               r"Directory\\Background\\shell\\OpenInClaude\\command")
-                winreg.DeleteKey(winreg.HKEY_CLASSES_ROOT, 
-                               r"Directory\\Background\\shell\\OpenInClaude")
-            except WindowsError:
-                pass  # Key might not exist
-            
-            try:
-                winreg.DeleteKey(winreg.HKEY_CLASSES_ROOT, 
-                               r"Directory\\shell\\OpenInClaude\\command")
-                winreg.DeleteKey(winreg.HKEY_CLASSES_ROOT, 
-                               r"Directory\\shell\\OpenInClaude")
-            except WindowsError:
-                pass  # Key might not exist
+            self.remove_menu_keys()
             
             # Remove launcher script
             if self.launcher_path.exists():
@@ -414,22 +826,37 @@ exit /b 0
         except Exception as e:
             colored_print(f"Failed to remove context menu: {e}", Colors.RED)
             return False
+        finally:
+            self.invalidate()
 
 class ClaudeInstallerGUI:
     """GUI interface for Claude Code installer"""
     
     def __init__(self):
+        load_tkinter()
         self.root = tk.Tk()
         self.root.title("Claude Code Windows Setup")
         self.root.geometry("600x500")
         self.root.resizable(True, True)
         
-        # Create managers
-        self.wsl_manager = WSLManager()
-        self.claude_manager = ClaudeCodeManager()
+        # Create managers sharing one WSL session
+        self.session = WSLSession()
+        self.wsl_manager = WSLManager(self.session)
+        self.claude_manager = ClaudeCodeManager(self.session, self.wsl_manager)
         self.context_manager = ContextMenuManager()
         
+        # WSL presence and the registry entry only change when this installer
+        # changes them, so they are probed once and kept until forget_status()
+        self.sticky_status: Dict[str, bool] = {}
+        
+        # Worker threads never touch Tk directly: log lines and widget calls
+        # (see call_soon) are queued here and run by _drain_queues on the GUI thread
+        self._log_queue = queue.Queue()
+        self._call_queue = queue.Queue()
+        
         self.setup_gui()
+        set_output_handler(self.log_message)
+        self.root.after(50, self._drain_queues)
         self.update_status()
         
     def setup_gui(self):
@@ -470,6 +897,10 @@ class ClaudeInstallerGUI:
                                        command=self.uninstall, width=20)
         self.uninstall_btn.grid(row=0, column=2, padx=5)
         
+        self.refresh_btn = ttk.Button(buttons_frame, text="Refresh", 
+                                     command=self.refresh_status, width=10)
+        self.refresh_btn.grid(row=0, column=3, padx=5)
+        
         # Progress bar
         self.progress = ttk.Progressbar(main_frame, mode='indeterminate')
         self.progress.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=10)
@@ -490,44 +921,99 @@ class ClaudeInstallerGUI:
         log_frame.rowconfigure(0, weight=1)
         
     def log_message(self, message: str):
-        """Add message to log display"""
-        self.log_text.insert(tk.END, message + "\n")
-        self.log_text.see(tk.END)
-        self.root.update()
+        """Add message to log display (safe to call from any thread)"""
+        self._log_queue.put(message)
         
-    def update_status(self):
-        """Update status indicators"""
-        # Add debugging info
-        wsl_installed = self.wsl_manager.is_wsl_installed()
-        ubuntu_installed = self.wsl_manager.is_ubuntu_installed()
-        claude_installed = self.claude_manager.is_claude_installed()
-        context_installed = self.context_manager.is_installed()
+    def call_soon(self, func: Callable, *args):
+        """Run func(*args) on the GUI thread (safe to call from any thread)"""
+        self._call_queue.put((func, args))
         
-        # Log the detection results for debugging
-        logger.info(f"WSL detected: {wsl_installed}")
-        logger.info(f"Ubuntu detected: {ubuntu_installed}")
-        logger.info(f"Claude Code detected: {claude_installed}")
-        logger.info(f"Context Menu detected: {context_installed}")
-        
-        statuses = {
-            "WSL": "✓ Installed" if wsl_installed else "✗ Not installed",
-            "Ubuntu": "✓ Installed" if ubuntu_installed else "✗ Not installed", 
-            "Claude Code": "✓ Installed" if claude_installed else "✗ Not installed",
-            "Context Menu": "✓ Installed" if context_installed else "✗ Not installed"
+    def _drain_queues(self, max_lines: int = 200):
+        """Move queued log lines into the log display, run queued calls, then reschedule"""
+        try:
+            lines = []
+            while len(lines) < max_lines:
+                try:
+                    lines.append(self._log_queue.get_nowait())
+                except queue.Empty:
+                    break
+            if lines:
+                self.log_text.insert(tk.END, "\n".join(lines) + "\n")
+                self.log_text.see(tk.END)
+            while True:
+                try:
+                    func, args = self._call_queue.get_nowait()
+                except queue.Empty:
+                    break
+                # One failing call (e.g. a TclError from a dialog) must not
+                # keep the ones behind it, like enable_buttons, from running
+                try:
+                    func(*args)
+                except Exception as e:
+                    logger.error(f"GUI update {getattr(func, '__name__', func)} failed: {e}")
+        finally:
+            # Always keep the pump alive, or log lines and queued calls stop for good
+            self.root.after(50, self._drain_queues)
+        
+    def probe_status(self) -> Dict[str, bool]:
+        """Run all installation checks concurrently and return the results"""
+        probes = {
+            "WSL": self.wsl_manager.is_wsl_installed,
+            "Ubuntu": self.wsl_manager.is_ubuntu_installed,
+            "Claude Code": self.claude_manager.is_claude_installed,
+            "Context Menu": self.context_manager.is_installed,
         }
+        results = run_probes({component: probe for component, probe in probes.items()
+                              if component not in self.sticky_status})
+        
+        for component in ("WSL", "Context Menu"):
+            if component in results:
+                self.sticky_status[component] = results[component]
+        results.update(self.sticky_status)
+        
+        # Log the detection results for debugging
+        for component, installed in results.items():
+            logger.info(f"{component} detected: {installed}")
+        
+        return results
+        
+    def update_status(self):
+        """Update status indicators without blocking the GUI thread"""
+        def refresh():
+            results = self.probe_status()
+            self.call_soon(self.show_status, results)
         
-        for component, status in statuses.items():
-            self.status_labels[component].config(text=status)
-            if "✓" in status:
-                self.status_labels[component].config(foreground="green")
+        threading.Thread(target=refresh, daemon=True).start()
+    
+    def forget_status(self, *components: str):
+        """Drop remembered results so the next refresh probes them again"""
+        for component in components:
+            self.sticky_status.pop(component, None)
+    
+    def refresh_status(self):
+        """Re-run every check from scratch"""
+        self.forget_status("WSL", "Context Menu")
+        self.wsl_manager.invalidate()
+        self.claude_manager.record_installed(False)
+        self.claude_manager.invalidate()
+        self.context_manager.invalidate()
+        self.update_status()
+    
+    def show_status(self, results: Dict[str, bool]):
+        """Apply probe results to the status labels (GUI thread only)"""
+        for component, installed in results.items():
+            label = self.status_labels[component]
+            if installed:
+                label.config(text="✓ Installed", foreground="green")
             else:
-                self.status_labels[component].config(foreground="red")
+                label.config(text="✗ Not installed", foreground="red")
     
     def disable_buttons(self):
         """Disable all buttons during operations"""
         self.install_btn.config(state="disabled")
         self.context_btn.config(state="disabled")
         self.uninstall_btn.config(state="disabled")
+        self.refresh_btn.config(state="disabled")
         self.progress.start()
         
     def enable_buttons(self):
@@ -535,24 +1021,26 @@ class ClaudeInstallerGUI:
         self.install_btn.config(state="normal")
         self.context_btn.config(state="normal")
         self.uninstall_btn.config(state="normal")
+        self.refresh_btn.config(state="normal")
         self.progress.stop()
         
     def install_everything(self):
         """Install only what's missing - smart installation"""
         def install():
             try:
-                self.disable_buttons()
                 self.log_message("Checking what needs to be installed...")
                 
                 if not is_admin():
-                    messagebox.showerror("Error", "Administrator privileges required!\nPlease run as Administrator.")
+                    self.call_soon(messagebox.showerror, "Error", "Administrator privileges required!\nPlease run as Administrator.")
                     return
                 
-                # Check what's already installed
-                wsl_installed = self.wsl_manager.is_wsl_installed()
-                ubuntu_installed = self.wsl_manager.is_ubuntu_installed()
-                claude_installed = self.claude_manager.is_claude_installed()
-                context_installed = self.context_manager.is_installed()
+                # Check what's already installed (answered from the managers'
+                # probe cache when the status panel refreshed recently)
+                status = self.probe_status()
+                wsl_installed = status["WSL"]
+                ubuntu_installed = status["Ubuntu"]
+                claude_installed = status["Claude Code"]
+                context_installed = status["Context Menu"]
                 
                 # Count what needs installation
                 missing_components = []
@@ -567,7 +1055,7 @@ class ClaudeInstallerGUI:
                 
                 if not missing_components:
                     self.log_message("Everything is already installed!")
-                    messagebox.showinfo("All Set!", "Everything is already installed!\n\nYou can right-click in any folder and select 'Open in Claude Code'.")
+                    self.call_soon(messagebox.showinfo, "All Set!", "Everything is already installed!\n\nYou can right-click in any folder and select 'Open in Claude Code'.")
                     return
                 
                 self.log_message(f"Installing missing components: {', '.join(missing_components)}")
@@ -576,8 +1064,9 @@ class ClaudeInstallerGUI:
                 if not wsl_installed:
                     self.log_message("Installing WSL...")
                     if not self.wsl_manager.install_wsl():
-                        messagebox.showerror("Error", "WSL installation failed!")
+                        self.call_soon(messagebox.showerror, "Error", "WSL installation failed!")
                         return
+                    self.forget_status("WSL")
                     self.log_message("WSL installation complete. You may need to restart.")
                 else:
                     self.log_message("✓ WSL already installed, skipping...")
@@ -586,7 +1075,7 @@ class ClaudeInstallerGUI:
                 if not ubuntu_installed:
                     self.log_message("Installing Ubuntu...")
                     if not self.wsl_manager.install_ubuntu():
-                        messagebox.showerror("Error", "Ubuntu installation failed!")
+                        self.call_soon(messagebox.showerror, "Error", "Ubuntu installation failed!")
                         return
                 else:
                     self.log_message("✓ Ubuntu already installed, skipping...")
@@ -595,12 +1084,12 @@ class ClaudeInstallerGUI:
                 if not claude_installed:
                     self.log_message("Setting up Ubuntu environment for Claude Code...")
                     if not self.wsl_manager.setup_ubuntu_environment():
-                        messagebox.showerror("Error", "Ubuntu setup failed!")
+                        self.call_soon(messagebox.showerror, "Error", "Ubuntu setup failed!")
                         return
                     
                     self.log_message("Installing Claude Code...")
                     if not self.claude_manager.install_claude_code():
-                        messagebox.showerror("Error", "Claude Code installation failed!")
+                        self.call_soon(messagebox.showerror, "Error", "Claude Code installation failed!")
                         return
                 else:
                     self.log_message("✓ Claude Code already installed, skipping...")
@@ -608,89 +1097,164 @@ class ClaudeInstallerGUI:
                 # Install context menu if needed
                 if not context_installed:
                     self.log_message("Installing context menu integration...")
+                    self.forget_status("Context Menu")
                     if not self.context_manager.install_context_menu():
-                        messagebox.showerror("Error", "Context menu installation failed!")
+                        self.call_soon(messagebox.showerror, "Error", "Context menu installation failed!")
                         return
                 else:
                     self.log_message("✓ Context menu already installed, skipping...")
                 
                 self.log_message("Installation complete!")
-                messagebox.showinfo("Success", f"Successfully installed: {', '.join(missing_components)}\n\nYou can now right-click in any folder and select 'Open in Claude Code'.")
+                self.call_soon(messagebox.showinfo, "Success", f"Successfully installed: {', '.join(missing_components)}\n\nYou can now right-click in any folder and select 'Open in Claude Code'.")
                 
             except Exception as e:
                 self.log_message(f"Error: {e}")
-                messagebox.showerror("Error", f"Installation failed: {e}")
+                self.call_soon(messagebox.showerror, "Error", f"Installation failed: {e}")
             finally:
-                self.enable_buttons()
+                self.call_soon(self.enable_buttons)
                 self.update_status()
         
+        self.disable_buttons()
         threading.Thread(target=install, daemon=True).start()
     
     def install_context_only(self):
         """Install only context menu in a separate thread"""
         def install():
             try:
-                self.disable_buttons()
                 self.log_message("Installing context menu integration...")
                 
                 if not is_admin():
-                    messagebox.showerror("Error", "Administrator privileges required!\nPlease run as Administrator.")
+                    self.call_soon(messagebox.showerror, "Error", "Administrator privileges required!\nPlease run as Administrator.")
                     return
                 
+                self.forget_status("Context Menu")
                 if not self.context_manager.install_context_menu():
-                    messagebox.showerror("Error", "Context menu installation failed!")
+                    self.call_soon(messagebox.showerror, "Error", "Context menu installation failed!")
                     return
                 
                 self.log_message("Context menu installation complete!")
-                messagebox.showinfo("Success", "Context menu installed successfully!\n\nYou can now right-click in any folder and select 'Open in Claude Code'.")
+                self.call_soon(messagebox.showinfo, "Success", "Context menu installed successfully!\n\nYou can now right-click in any folder and select 'Open in Claude Code'.")
                 
             except Exception as e:
                 self.log_message(f"Error: {e}")
-                messagebox.showerror("Error", f"Installation failed: {e}")
+                self.call_soon(messagebox.showerror, "Error", f"Installation failed: {e}")
             finally:
-                self.enable_buttons()
+                self.call_soon(self.enable_buttons)
                 self.update_status()
         
+        self.disable_buttons()
         threading.Thread(target=install, daemon=True).start()
     
     def uninstall(self):
         """Uninstall context menu in a separate thread"""
         def uninstall():
             try:
-                self.disable_buttons()
                 self.log_message("Uninstalling context menu integration...")
                 
                 if not is_admin():
-                    messagebox.showerror("Error", "Administrator privileges required!\nPlease run as Administrator.")
+                    self.call_soon(messagebox.showerror, "Error", "Administrator privileges required!\nPlease run as Administrator.")
                     return
                 
+                self.forget_status("Context Menu")
                 if not self.context_manager.uninstall_context_menu():
-                    messagebox.showerror("Error", "Uninstallation failed!")
+                    self.call_soon(messagebox.showerror, "Error", "Uninstallation failed!")
                     return
                 
                 self.log_message("Uninstallation complete!")
-                messagebox.showinfo("Success", "Context menu uninstalled successfully!")
+                self.call_soon(messagebox.showinfo, "Success", "Context menu uninstalled successfully!")
                 
             except Exception as e:
                 self.log_message(f"Error: {e}")
-                messagebox.showerror("Error", f"Uninstallation failed: {e}")
+                self.call_soon(messagebox.showerror, "Error", f"Uninstallation failed: {e}")
             finally:
-                self.enable_buttons()
+                self.call_soon(self.enable_buttons)
                 self.update_status()
         
+        self.disable_buttons()
         threading.Thread(target=uninstall, daemon=True).start()
     
     def run(self):
         """Run the GUI"""
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            self.session.close()
+
+# Console banners are static, so they are colored and joined once at import
+INSTALL_BANNER = colored_block(
+    ("=" * 60, Colors.MAGENTA),
+    ("    Claude Code Windows Installer", Colors.MAGENTA),
+    ("=" * 60, Colors.MAGENTA),
+)
+
+STATUS_BANNER = colored_block(
+    ("=" * 60, Colors.CYAN),
+    ("    Claude Code Installation Status", Colors.CYAN),
+    ("=" * 60, Colors.CYAN),
+)
+
+SUCCESS_MESSAGE = colored_block(
+    ("=" * 60, Colors.GREEN),
+    ("         Installation Complete!", Colors.GREEN),
+    ("=" * 60, Colors.GREEN),
+    ("\nHow to use:", Colors.CYAN),
+    ("1. Open Windows Explorer", Colors.WHITE),
+    ("2. Navigate to any folder", Colors.WHITE),
+    ("3. Right-click in the folder (empty space)", Colors.WHITE),
+    ("4. Select 'Open in Claude Code'", Colors.WHITE),
+    ("5. Claude Code will launch in that directory!", Colors.WHITE),
+    ("\nAlternative usage:", Colors.CYAN),
+    ("• Open WSL Ubuntu terminal: type 'ubuntu'", Colors.WHITE),
+    ("• Navigate to your project: cd /mnt/c/your/project/path", Colors.WHITE),
+    ("• Start Claude Code: claude", Colors.WHITE),
+    ("\nFor more info: https://docs.anthropic.com/en/docs/claude-code/setup", Colors.CYAN),
+)
+
+class InstallStep(NamedTuple):
+    """One stage of a full installation"""
+    name: str  # key under "completed_steps" in the persisted state
+    label: str
+    check: Callable[[], bool]
+    install: Callable[[], bool]
+    remember: bool = False  # trust a recorded success instead of re-running check
+    may_need_restart: bool = False
+    # Console messages when the step is skipped / run; derived from label if None
+    skip_message: Optional[str] = None
+    install_message: Optional[str] = None
+
+def record_step(name: str, done: bool) -> None:
+    """Persist whether an install step has completed"""
+    state = load_state()
+    state.setdefault('completed_steps', {})[name] = done
+    save_state(state)
+
+# Distribution names that look like Ubuntu, for status diagnostics
+UBUNTU_NAME_RE = re.compile(r'ubuntu', re.IGNORECASE)
+
+# First Windows 10 build that supports WSL2
+MIN_WINDOWS_BUILD = 18362
 
 class ClaudeInstaller:
     """Main installer class for command line usage"""
     
-    def __init__(self):
-        self.wsl_manager = WSLManager()
-        self.claude_manager = ClaudeCodeManager()
+    def __init__(self, assume_yes: bool = False, no_update: bool = False,
+                 assume_restart_done: bool = False):
+        self.session = WSLSession()
+        self.wsl_manager = WSLManager(self.session)
+        self.claude_manager = ClaudeCodeManager(self.session, self.wsl_manager)
         self.context_manager = ContextMenuManager()
+        
+        # Answers to interactive prompts, for unattended runs
+        self.assume_yes = assume_yes
+        self.no_update = no_update
+        self.assume_restart_done = assume_restart_done
+    
+    def confirm(self, question: str) -> bool:
+        """Ask a y/n question; --yes answers it without reading stdin"""
+        if self.assume_yes:
+            colored_print(f"{question} (y/n): y  [--yes]", Colors.CYAN)
+            return True
+        return input(f"{question} (y/n): ").lower() in ['y', 'yes']
     
     def check_prerequisites(self) -> bool:
         """Check system prerequisites"""
@@ -713,74 +1277,94 @@ class ClaudeInstaller:
         
         # Check Windows version (Windows 10 build 18362 or higher for WSL2)
         try:
-            import platform
-            win_version = platform.version()
-            colored_print(f"✓ Windows version: {win_version}", Colors.GREEN)
-        except:
+            # Direct GetVersionEx call; platform.version() may shell out to `ver`
+            v = sys.getwindowsversion()
+        except AttributeError:
             colored_print("Warning: Could not detect Windows version", Colors.YELLOW)
+        else:
+            win_version = f"{v.major}.{v.minor}.{v.build}"
+            if v.major < 10 or v.build < MIN_WINDOWS_BUILD:
+                colored_print(f"ERROR: Windows version {win_version} is too old for WSL2!", Colors.RED)
+                colored_print(f"Windows 10 build {MIN_WINDOWS_BUILD} or higher is required.", Colors.RED)
+                return False
+            colored_print(f"✓ Windows version: {win_version}", Colors.GREEN)
         
         return True
     
     def install_full(self) -> bool:
         """Perform full installation"""
-        colored_print("=" * 60, Colors.MAGENTA)
-        colored_print("    Claude Code Windows Installer", Colors.MAGENTA)
-        colored_print("=" * 60, Colors.MAGENTA)
+        print_block(INSTALL_BANNER)
         
         if not self.check_prerequisites():
             return False
         
-        # Install WSL if needed
-        if not self.wsl_manager.is_wsl_installed():
-            colored_print("WSL not found. Installing WSL...", Colors.YELLOW)
-            if not self.wsl_manager.install_wsl():
-                return False
-            colored_print("WSL installation complete. A restart may be required.", Colors.YELLOW)
-            
-            restart = input("Do you need to restart your computer now? (y/n): ").lower()
-            if restart in ['y', 'yes']:
-                colored_print("Please restart your computer and run this installer again.", Colors.YELLOW)
-                return False
-        else:
-            colored_print("✓ WSL is already installed", Colors.GREEN)
-        
-        # Install Ubuntu if needed
-        if not self.wsl_manager.is_ubuntu_installed():
-            colored_print("Ubuntu not found. Installing Ubuntu...", Colors.YELLOW)
-            if not self.wsl_manager.install_ubuntu():
-                return False
-        else:
-            colored_print("✓ Ubuntu is already installed", Colors.GREEN)
-        
-        # Setup Ubuntu environment (skip if Claude Code is already installed)
-        if self.claude_manager.is_claude_installed():
-            colored_print("✓ Claude Code already installed, skipping Ubuntu environment setup", Colors.GREEN)
-        else:
-            colored_print("Setting up Ubuntu environment for Claude Code installation...", Colors.YELLOW)
-            if not self.wsl_manager.setup_ubuntu_environment():
-                return False
+        # WSL is remembered once installed so a rerun after the restart it
+        # asks for resumes without probing it again; Ubuntu's check is a cheap
+        # `wsl --list` that also notices a distro unregistered since
+        steps = [
+            InstallStep("wsl", "WSL", self.wsl_manager.is_wsl_installed,
+                        self.wsl_manager.install_wsl, remember=True, may_need_restart=True),
+            InstallStep("ubuntu", "Ubuntu", self.wsl_manager.is_ubuntu_installed,
+                        self.wsl_manager.install_ubuntu),
+            # Environment setup is only needed when Claude Code is missing
+            InstallStep("ubuntu_env", "Ubuntu environment",
+                        self.claude_manager.is_claude_installed,
+                        self.wsl_manager.setup_ubuntu_environment,
+                        skip_message="✓ Claude Code is installed, Ubuntu environment setup not needed",
+                        install_message="Claude Code not found. Preparing the Ubuntu environment first..."),
+            InstallStep("claude", "Claude Code", self.claude_manager.is_claude_installed,
+                        self.claude_manager.install_claude_code),
+            InstallStep("context_menu", "Context menu", self.context_manager.is_installed,
+                        self.context_manager.install_context_menu),
+        ]
         
-        # Install Claude Code
-        if not self.claude_manager.is_claude_installed():
-            if not self.claude_manager.install_claude_code():
-                return False
-        else:
-            colored_print("✓ Claude Code is already installed", Colors.GREEN)
+        already_installed = self.run_steps(steps)
+        if already_installed is None:
+            return False
         
-        # Install context menu
-        if not self.context_manager.is_installed():
-            if not self.context_manager.install_context_menu():
-                return False
-        else:
-            colored_print("✓ Context menu is already installed", Colors.GREEN)
-            update = input("Do you want to update the existing installation? (y/n): ").lower()
-            if update in ['y', 'yes']:
+        if "context_menu" in already_installed:
+            if not self.no_update and self.confirm("Do you want to update the existing installation?"):
                 self.context_manager.uninstall_context_menu()
                 self.context_manager.install_context_menu()
         
+        # Progress only matters for resuming an interrupted install
+        state = load_state()
+        state.pop('completed_steps', None)
+        save_state(state)
+        
         self.show_success_message()
         return True
     
+    def run_steps(self, steps: List[InstallStep]) -> Optional[List[str]]:
+        """Install every step that isn't done yet, in order
+        
+        Returns the names of steps that were already in place, or None if a
+        step failed or the user chose to restart first.
+        """
+        completed = load_state().get('completed_steps', {})
+        already_installed = []
+        
+        for step in steps:
+            if (step.remember and completed.get(step.name)) or step.check():
+                colored_print(step.skip_message or f"✓ {step.label} is already installed", Colors.GREEN)
+                already_installed.append(step.name)
+                continue
+            
+            colored_print(step.install_message or f"{step.label} not found. Installing {step.label}...",
+                          Colors.YELLOW)
+            if not step.install():
+                return None
+            if step.remember:
+                record_step(step.name, True)
+            
+            if step.may_need_restart:
+                colored_print(f"{step.label} installation complete. A restart may be required.", Colors.YELLOW)
+                if not self.assume_restart_done and self.confirm("Do you need to restart your computer now?"):
+                    colored_print("Please restart your computer and run this installer again.", Colors.YELLOW)
+                    return None
+        
+        return already_installed
+    
     def install_context_menu_only(self) -> bool:
         """Install only the context menu integration"""
         colored_print("Installing Claude Code context menu integration...", Colors.CYAN)
@@ -793,8 +1377,7 @@ class ClaudeInstaller:
             colored_print("WARNING: Claude Code not found in WSL Ubuntu!", Colors.YELLOW)
             colored_print("Make sure you have WSL, Ubuntu, and Claude Code installed first.", Colors.YELLOW)
             
-            continue_anyway = input("Do you want to continue anyway? (y/n): ").lower()
-            if continue_anyway not in ['y', 'yes']:
+            if not self.confirm("Do you want to continue anyway?"):
                 return False
         
         return self.context_manager.install_context_menu()
@@ -814,62 +1397,52 @@ class ClaudeInstaller:
     
     def show_status(self) -> None:
         """Show installation status"""
-        colored_print("=" * 60, Colors.CYAN)
-        colored_print("    Claude Code Installation Status", Colors.CYAN)
-        colored_print("=" * 60, Colors.CYAN)
-        
-        # WSL Status with debugging
-        wsl_installed = self.wsl_manager.is_wsl_installed()
-        wsl_status = "✓ Installed" if wsl_installed else "✗ Not installed"
-        colored_print(f"WSL: {wsl_status}", Colors.GREEN if "✓" in wsl_status else Colors.RED)
-        
-        # Ubuntu Status with debugging  
-        ubuntu_installed = self.wsl_manager.is_ubuntu_installed()
-        ubuntu_status = "✓ Installed" if ubuntu_installed else "✗ Not installed"
-        colored_print(f"Ubuntu: {ubuntu_status}", Colors.GREEN if "✓" in ubuntu_status else Colors.RED)
-        
-        # If Ubuntu not detected, show debug info
-        if not ubuntu_installed:
-            try:
-                result = run_command(['wsl', '-l', '-v'], check=False)
-                clean_output = result.stdout.replace('\x00', '').strip()
-                colored_print(f"Debug - WSL list raw output: {repr(result.stdout)}", Colors.YELLOW)
-                colored_print(f"Debug - WSL list cleaned output: '{clean_output}'", Colors.YELLOW)
-                colored_print(f"Debug - Return code: {result.returncode}", Colors.YELLOW)
-                colored_print(f"Debug - Looking for 'ubuntu' in: '{clean_output.lower()}'", Colors.YELLOW)
-            except Exception as e:
-                colored_print(f"Debug - WSL list command failed: {e}", Colors.RED)
+        print_block(STATUS_BANNER)
         
-        # Claude Code Status
-        claude_status = "✓ Installed" if self.claude_manager.is_claude_installed() else "✗ Not installed"
-        colored_print(f"Claude Code: {claude_status}", Colors.GREEN if "✓" in claude_status else Colors.RED)
+        results = run_probes({
+            "WSL": self.wsl_manager.is_wsl_installed,
+            "Ubuntu": self.wsl_manager.is_ubuntu_installed,
+            "Claude Code": self.claude_manager.is_claude_installed,
+            "Context Menu": self.context_manager.is_installed,
+        })
         
-        # Context Menu Status
-        context_status = "✓ Installed" if self.context_manager.is_installed() else "✗ Not installed"
-        colored_print(f"Context Menu: {context_status}", Colors.GREEN if "✓" in context_status else Colors.RED)
+        for component, installed in results.items():
+            status = "✓ Installed" if installed else "✗ Not installed"
+            colored_print(f"{component}: {status}", Colors.GREEN if installed else Colors.RED)
+            
+            # If Ubuntu not detected, show debug info
+            if component == "Ubuntu" and not installed:
+                try:
+                    # Same listing is_ubuntu_installed just parsed, not a second wsl.exe run
+                    result = self.wsl_manager.wsl_list()
+                    colored_print(f"Debug - WSL list raw output: {repr(result.stdout)}", Colors.YELLOW)
+                    colored_print(f"Debug - Return code: {result.returncode}", Colors.YELLOW)
+                    colored_print(f"Debug - Installed distributions: {sorted(self.wsl_manager.distros())}", Colors.YELLOW)
+                    # Point out e.g. "Ubuntu-22.04", which isn't the "Ubuntu" distro the installer uses
+                    similar = [name for name in self.wsl_manager.distros() if UBUNTU_NAME_RE.search(name)]
+                    if similar:
+                        colored_print(f"Debug - Similar distributions (not named exactly 'Ubuntu'): {sorted(similar)}", Colors.YELLOW)
+                except Exception as e:
+                    colored_print(f"Debug - WSL list command failed: {e}", Colors.RED)
     
     def show_success_message(self) -> None:
         """Show installation success message"""
-        colored_print("=" * 60, Colors.GREEN)
-        colored_print("         Installation Complete!", Colors.GREEN)
-        colored_print("=" * 60, Colors.GREEN)
-        
-        colored_print("\\nHow to use:", Colors.CYAN)
-        colored_print("1. Open Windows Explorer", Colors.WHITE)
-        colored_print("2. Navigate to any folder", Colors.WHITE)
-        colored_print("3. Right-click in the folder (empty space)", Colors.WHITE)
-        colored_print("4. Select 'Open in Claude Code'", Colors.WHITE)
-        colored_print("5. Claude Code will launch in that directory!", Colors.WHITE)
-        
-        colored_print("\\nAlternative usage:", Colors.CYAN)
-        colored_print("• Open WSL Ubuntu terminal: type 'ubuntu'", Colors.WHITE)
-        colored_print("• Navigate to your project: cd /mnt/c/your/project/path", Colors.WHITE)
-        colored_print("• Start Claude Code: claude", Colors.WHITE)
-        
-        colored_print("\\nFor more info: https://docs.anthropic.com/en/docs/claude-code/setup", Colors.CYAN)
+        print_block(SUCCESS_MESSAGE)
 
 def main():
     """Main entry point"""
+    # If no arguments provided and running interactively, launch GUI; this
+    # is the double-click path, so it skips building the argument parser
+    if len(sys.argv) == 1:
+        try:
+            gui = ClaudeInstallerGUI()
+            gui.run()
+            return
+        except Exception as e:
+            print(f"GUI failed to start: {e}")
+            print("Falling back to console mode...")
+    
+    import argparse
     parser = argparse.ArgumentParser(description="Claude Code Windows Installer")
     parser.add_argument('--context-only', action='store_true',
                        help='Install only the context menu integration')
@@ -881,45 +1454,51 @@ def main():
                        help='Launch GUI interface')
     parser.add_argument('--console', action='store_true',
                        help='Force console mode')
+    parser.add_argument('--yes', '-y', action='store_true',
+                       help='Answer yes to all prompts (unattended install)')
+    parser.add_argument('--no-update', action='store_true',
+                       help='Keep an existing context menu installation as is')
+    parser.add_argument('--assume-restart-done', action='store_true',
+                       help='Continue after installing WSL without asking about a restart')
+    parser.add_argument('--verbose', '-v', action='store_true',
+                       help='Log command output and full tracebacks')
     
     args = parser.parse_args()
-    
-    # If no arguments provided and running interactively, launch GUI
-    if len(sys.argv) == 1 and not args.console:
-        try:
-            gui = ClaudeInstallerGUI()
-            gui.run()
-            return
-        except Exception as e:
-            print(f"GUI failed to start: {e}")
-            print("Falling back to console mode...")
+    if args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
     
     # Console mode
-    installer = ClaudeInstaller()
+    installer = ClaudeInstaller(assume_yes=args.yes, no_update=args.no_update,
+                                assume_restart_done=args.assume_restart_done)
+    
+    # First flag that is set picks the action; a full install otherwise
+    actions = {
+        'status': installer.show_status,
+        'uninstall': installer.uninstall,
+        'context_only': installer.install_context_menu_only,
+        'gui': lambda: ClaudeInstallerGUI().run(),
+    }
+    action = next((fn for flag, fn in actions.items() if getattr(args, flag)),
+                  installer.install_full)
     
     try:
-        if args.status:
-            installer.show_status()
-        elif args.uninstall:
-            success = installer.uninstall()
-            sys.exit(0 if success else 1)
-        elif args.context_only:
-            success = installer.install_context_menu_only()
-            sys.exit(0 if success else 1)
-        elif args.gui:
-            gui = ClaudeInstallerGUI()
-            gui.run()
-        else:
-            success = installer.install_full()
-            sys.exit(0 if success else 1)
+        # Status and GUI return None; only an explicit False is a failure
+        success = action()
+        sys.exit(1 if success is False else 0)
     
     except KeyboardInterrupt:
         colored_print("\\nInstallation cancelled by user.", Colors.YELLOW)
         sys.exit(1)
     except Exception as e:
         colored_print(f"\\nUnexpected error: {e}", Colors.RED)
-        logger.exception("Unexpected error occurred")
+        # Formatting the traceback is only worth it when asked for
+        if args.verbose:
+            logger.exception("Unexpected error occurred")
+        else:
+            logger.error(f"Unexpected error occurred: {e} (run with --verbose for a traceback)")
         sys.exit(1)
+    finally:
+        installer.session.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file